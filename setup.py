@@ -34,6 +34,7 @@ software_licence = readfile("LICENSE")
 requires = [
     'cmlibs.argon >= 0.4.0',
     'cmlibs.zinc',
+    'numpy',
     'svgpathtools_light',
 ]
 
@@ -55,6 +56,7 @@ setup(
     zip_safe=False,
     install_requires=requires,
     extras_require={
+        "fast_json": ["orjson"],
         "thumbnail_hardware": ["PySide6"],
         "thumbnail_software": ["PyOpenGL"],
     }
@@ -1,9 +1,53 @@
+import json
 import os
 
+from collections import OrderedDict
+from contextlib import contextmanager
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 from cmlibs.argon.argondocument import ArgonDocument
 from cmlibs.argon.argonerror import ArgonError
 from cmlibs.argon.argonlogger import ArgonLogger
 
+_DOCUMENT_CACHE_SIZE = 4
+_document_cache = OrderedDict()
+
+
+def write_json(path, obj, pretty=False, default=None):
+    """
+    Serialise *obj* as JSON to the file at *path*, using orjson when it is
+    available and falling back to the standard library json module.
+
+    :param path: The file to write the JSON document to.
+    :param obj: The object to serialise.
+    :param pretty: Optional; Sort keys and indent the output when True.
+    :param default: Optional; Callable returning a serialisable form of objects JSON does not know.
+    """
+    if orjson is not None:
+        option = (orjson.OPT_SORT_KEYS | orjson.OPT_INDENT_2) if pretty else 0
+        with open(path, 'wb') as f:
+            f.write(orjson.dumps(obj, default=default, option=option))
+    else:
+        with open(path, 'w') as f:
+            if pretty:
+                json.dump(obj, f, default=default, sort_keys=True, indent=2)
+            else:
+                json.dump(obj, f, default=default)
+
+
+@contextmanager
+def _working_directory(path):
+    previous_wd = os.getcwd()
+    os.chdir(path)
+    try:
+        yield
+    finally:
+        os.chdir(previous_wd)
+
 
 class BaseExporter(object):
 
@@ -64,25 +108,36 @@ class BaseExporter(object):
         Loads the named Argon file and on success sets filename as the current location.
         Emits documentChange separately if new document loaded, including if existing document cleared due to load failure.
 
+        Documents loaded from an unchanged file are shared between exporters
+        through a small cache and must be treated as read-only; rebuild into a
+        new document before modifying one.
+
         :return:  True on success, otherwise False.
         """
         if filename is None:
             return False
 
         try:
+            if not os.path.isabs(filename):
+                filename = os.path.abspath(filename)
+            cache_key = (filename, os.path.getmtime(filename), os.path.getsize(filename))
+            document = _document_cache.get(cache_key)
+            if document is not None:
+                _document_cache.move_to_end(cache_key)
+                self._document = document
+                return True
+
             with open(filename, 'r') as f:
                 state = f.read()
 
-            current_wd = os.getcwd()
-            # set current directory to path from file, to support scripts and FieldML with external resources
-            if not os.path.isabs(filename):
-                filename = os.path.abspath(filename)
-            path = os.path.dirname(filename)
-            os.chdir(path)
             self._document = ArgonDocument()
             self._document.initialiseVisualisationContents()
-            self._document.deserialize(state)
-            os.chdir(current_wd)
+            # set current directory to path from file, to support scripts and FieldML with external resources
+            with _working_directory(os.path.dirname(filename)):
+                self._document.deserialize(state)
+            _document_cache[cache_key] = self._document
+            while len(_document_cache) > _DOCUMENT_CACHE_SIZE:
+                _document_cache.popitem(last=False)
             return True
         except (ArgonError, IOError, ValueError) as e:
             ArgonLogger.getLogger().error("Failed to load Argon visualisation " + filename + ": " + str(e))
@@ -49,10 +49,14 @@ class BaseImageExporter(BaseExporter):
             self._output_target = output_target
 
         if self._document is not None:
+            # Rebuild into a fresh document rather than resetting in place, the
+            # current document may be shared with other exporters through the
+            # load cache.
             state = self._document.serialize()
-            self._document.freeVisualisationContents()
-            self._document.initialiseVisualisationContents()
-            self._document.deserialize(state)
+            document = ArgonDocument()
+            document.initialiseVisualisationContents()
+            document.deserialize(state)
+            self._document = document
 
         self.export_image()
 
@@ -2,9 +2,9 @@
 Export an Argon document to source document(s) suitable for the generating
 flatmaps from.
 """
-import json
 import os
-import random
+
+import numpy as np
 
 from svgpathtools import svg2paths
 from xml.dom.minidom import parseString
@@ -13,11 +13,15 @@ from cmlibs.zinc.field import Field
 from cmlibs.zinc.node import Node
 from cmlibs.zinc.result import RESULT_OK
 
-from cmlibs.exporter.base import BaseExporter
-from cmlibs.maths.vectorops import sub, div, add
+from cmlibs.exporter.base import BaseExporter, write_json
 from cmlibs.utils.zinc.field import get_group_list
 
 
+_PATH_FMT = '<path d="M {:g} {:g} C {:g} {:g}, {:g} {:g}, {:g} {:g}"  fill-opacity="0.0"/>'
+_PATH_UNGROUPED_FMT = '<path d="M {:g} {:g} C {:g} {:g}, {:g} {:g}, {:g} {:g}" stroke="blue"  fill-opacity="0.0"/>'
+_MARKER_FMT = '<circle cx="{:g}" cy="{:g}" r="3" fill-opacity="0.0"><title id="title{}">.id({})</title></circle>'
+
+
 class ArgonSceneExporter(BaseExporter):
     """
     Export a visualisation described by an Argon document to webGL.
@@ -74,9 +78,8 @@ class ArgonSceneExporter(BaseExporter):
         """
         region = scene.getRegion()
         path_points = _analyze_elements(region, "coordinates")
-        bezier = _calculate_bezier_control_points(path_points)
         markers = _calculate_markers(region, "coordinates")
-        svg_string = _write_into_svg_format(bezier, markers)
+        svg_string = _write_into_svg_format(path_points, markers)
         paths, attributes = svg2paths(svg_string)
         bbox = [999999999, -999999999, 999999999, -999999999]
         for p in paths:
@@ -117,8 +120,8 @@ class ArgonSceneExporter(BaseExporter):
         with open(f'{os.path.join(self._output_target, self._prefix)}.svg', 'w') as f:
             f.write(svg_string)
 
-        with open(f'{os.path.join(self._output_target, f"{self._prefix}_properties")}.json', 'w') as f:
-            json.dump(properties, f, default=lambda o: o.__dict__, sort_keys=True, indent=2)
+        write_json(f'{os.path.join(self._output_target, f"{self._prefix}_properties")}.json', properties,
+                   pretty=True, default=lambda o: o.__dict__)
 
 
 def _calculate_markers(region, coordinate_field_name):
@@ -142,6 +145,10 @@ def _calculate_markers(region, coordinate_field_name):
         marker_iterator = marker_datapoints.createNodeiterator()
         components_count = coordinate_field.getNumberOfComponents()
 
+        rand_ids = None
+        if not id_field.isValid():
+            rand_ids = np.random.default_rng().integers(1, 100000, size=marker_datapoints.getSize())
+
         marker = marker_iterator.next()
         fc = fm.createFieldcache()
 
@@ -154,12 +161,11 @@ def _calculate_markers(region, coordinate_field_name):
             else:
                 name = f"Unnamed marker {i + 1}"
 
-            if id_field.isValid():
+            if rand_ids is None:
                 onto_id = id_field.evaluateString(fc)
             else:
-                rand_num = random.randint(1, 99999)
-                onto_id = f"UBERON:99{rand_num:0=5}"
-            marker_data.append((f"marker_{marker.getIdentifier()}", values[:2], name, onto_id))
+                onto_id = f"UBERON:99{rand_ids[i]:0=5}"
+            marker_data.append((f"marker_{marker.getIdentifier()}", (values[0], values[1]), name, onto_id))
             marker = marker_iterator.next()
             i += 1
 
@@ -178,143 +184,130 @@ def _analyze_elements(region, coordinate_field_name):
         return []
 
     group_list = get_group_list(fm)
-    group_index = 0
     groups = {
         "ungrouped": []
     }
-    for group in group_list:
+    element_groups = {}
+    for group_index, group in enumerate(group_list):
         group_name = group.getName()
+        group_label = f"group_{group_index + 1}"
         if group_name != "marker":
-            group_label = f"group_{group_index + 1}"
             groups[group_label] = []
             groups[f"{group_label}_name"] = group_name
-        group_index += 1
+
+        mesh_group = group.getMeshGroup(mesh)
+        if mesh_group.isValid():
+            mesh_group_iterator = mesh_group.createElementiterator()
+            mesh_group_element = mesh_group_iterator.next()
+            while mesh_group_element.isValid():
+                element_groups.setdefault(mesh_group_element.getIdentifier(), []).append(group_label)
+                mesh_group_element = mesh_group_iterator.next()
+
+    if not coordinates.isValid():
+        return groups
+
+    fc = fm.createFieldcache()
+    components_count = coordinates.getNumberOfComponents()
+    node_parameters_cache = {}
+    ungrouped = groups["ungrouped"]
     el_iterator = mesh.createElementiterator()
 
     element = el_iterator.next()
     while element.isValid():
         eft = element.getElementfieldtemplate(coordinates, -1)
-        function_count = eft.getNumberOfFunctions()
-        status = [function_count == 4]
-        for f in range(1, function_count + 1):
-            term_count = eft.getFunctionNumberOfTerms(f)
-            status.append(term_count == 1)
-
-        if all(status):
-            values_1, derivatives_1 = _get_parameters_from_eft(element, eft, coordinates)
-            values_2, derivatives_2 = _get_parameters_from_eft(element, eft, coordinates, False)
-
-            group_index = 0
-            in_group = False
-            for group in group_list:
-                mesh_group = group.getMeshGroup(mesh)
-                if mesh_group.containsElement(element):
-                    group_label = f"group_{group_index + 1}"
-                    groups[group_label].append([(values_1, derivatives_1), (values_2, derivatives_2)])
-                    in_group = True
-
-                group_index += 1
-
-            if not in_group:
-                groups["ungrouped"].append([(values_1, derivatives_1), (values_2, derivatives_2)])
+        suitable = eft.getNumberOfFunctions() == 4 and all(eft.getFunctionNumberOfTerms(f) == 1 for f in range(1, 5))
+        if suitable:
+            values_1, derivatives_1 = _get_parameters_from_eft(element, eft, coordinates, components_count, fc, node_parameters_cache)
+            values_2, derivatives_2 = _get_parameters_from_eft(element, eft, coordinates, components_count, fc, node_parameters_cache, False)
+
+            element_data = (values_1, derivatives_1, values_2, derivatives_2)
+            if element_groups:
+                for group_label in element_groups.get(element.getIdentifier(), ["ungrouped"]):
+                    groups[group_label].append(element_data)
+            else:
+                # No group holds any element, so skip membership lookups entirely.
+                ungrouped.append(element_data)
 
         element = el_iterator.next()
 
+    for group_label in groups:
+        if not group_label.endswith("_name"):
+            groups[group_label] = np.asarray(groups[group_label], dtype=np.float64).reshape(-1, 4, components_count)
+
     return groups
 
 
-def _get_parameters_from_eft(element, eft, coordinates, first=True):
+def _get_parameters_from_eft(element, eft, coordinates, components_count, fieldcache, node_parameters_cache, first=True):
     start_fn = 0 if first else 2
     ln = eft.getTermLocalNodeIndex(start_fn + 1, 1)
     node_1 = element.getNode(eft, ln)
     version = eft.getTermNodeVersion(start_fn + 1, 1)
-    values = _get_node_data(node_1, coordinates, Node.VALUE_LABEL_VALUE, version)
+    values = _get_node_data(node_1, coordinates, Node.VALUE_LABEL_VALUE, version, components_count, fieldcache, node_parameters_cache)
     version = eft.getTermNodeVersion(start_fn + 2, 1)
-    derivatives = _get_node_data(node_1, coordinates, Node.VALUE_LABEL_D_DS1, version)
+    derivatives = _get_node_data(node_1, coordinates, Node.VALUE_LABEL_D_DS1, version, components_count, fieldcache, node_parameters_cache)
 
     return values, derivatives
 
 
-def _get_node_data(node, coordinate_field, node_parameter, version):
-    fm = coordinate_field.getFieldmodule()
-    fc = fm.createFieldcache()
-
-    components_count = coordinate_field.getNumberOfComponents()
-
-    if node.isValid():
-        fc.setNode(node)
-        result, values = coordinate_field.getNodeParameters(fc, -1, node_parameter, version, components_count)
-        if result == RESULT_OK:
-            return values
-
-    return None
+def _get_node_data(node, coordinate_field, node_parameter, version, components_count, fieldcache, node_parameters_cache):
+    if not node.isValid():
+        return None
 
+    key = (node.getIdentifier(), node_parameter, version)
+    if key not in node_parameters_cache:
+        fieldcache.setNode(node)
+        result, values = coordinate_field.getNodeParameters(fieldcache, -1, node_parameter, version, components_count)
+        node_parameters_cache[key] = values if result == RESULT_OK else None
 
-def _calculate_bezier_curve(pt_1, pt_2):
-    h0 = pt_1[0][:2]
-    v0 = pt_1[1][:2]
-    h1 = pt_2[0][:2]
-    v1 = pt_2[1][:2]
+    return node_parameters_cache[key]
 
-    b0 = h0
-    b1 = sub(h0, div(v0, 3))
-    b2 = add(h1, div(v1, 3))
-    b3 = h1
 
-    return b0, b1, b2, b3
+def _calculate_bezier_control_points(curves):
+    h0 = curves[:, 0, :2]
+    v0 = curves[:, 1, :2]
+    h1 = curves[:, 2, :2]
+    v1 = curves[:, 3, :2]
+    b1 = h0 - v0 * (1.0 / 3.0)
+    b2 = h1 + v1 * (1.0 / 3.0)
 
+    return np.stack([h0, b1, b2, h1], axis=1)
 
-def _calculate_bezier_control_points(point_data):
-    bezier = {}
 
-    for point_group in point_data:
-        if point_data[point_group] and not point_group.endswith("_name"):
-            bezier[point_group] = []
-            for curve_pts in point_data[point_group]:
-                bezier[point_group].append(_calculate_bezier_curve(curve_pts[0], curve_pts[1]))
+def _write_svg_bezier_path(curves, ungrouped=False):
+    template = _PATH_UNGROUPED_FMT if ungrouped else _PATH_FMT  # ungrouped paths are stroked blue
+    rows = np.reshape(_calculate_bezier_control_points(curves), (-1, 8))
 
-    return bezier
+    return ''.join([template.format(*row) for row in rows])
 
 
-def _write_svg_bezier_path(bezier_path, ungrouped=False):
-    svg = ''
-    for i in range(len(bezier_path)):
-        b = bezier_path[i]
-        stroke_attr = 'stroke="blue" ' if ungrouped else ''  # if i % 2 == 0 else 'red'
-        svg += f'<path d="M {b[0][0]} {b[0][1]} C {b[1][0]} {b[1][1]}, {b[2][0]} {b[2][1]}, {b[3][0]} {b[3][1]}" {stroke_attr} fill-opacity="0.0"/>'
+def _write_into_svg_format(point_data, markers):
+    group_names = [name for name in point_data if not name.endswith("_name") and len(point_data[name])]
+    group_paths = [_write_svg_bezier_path(point_data[name], name == "ungrouped") for name in group_names]
 
-    return svg
-
-
-def _write_into_svg_format(bezier_data, markers):
     title_count = 0
-    svg = '<svg width="1000" height="1000" viewBox="WWW XXX YYY ZZZ" xmlns="http://www.w3.org/2000/svg">'
-    for group_name in bezier_data:
+    parts = ['<svg width="1000" height="1000" viewBox="WWW XXX YYY ZZZ" xmlns="http://www.w3.org/2000/svg">']
+    for group_name, group_path in zip(group_names, group_paths):
         if group_name == "ungrouped":
-            svg += _write_svg_bezier_path(bezier_data[group_name], True)
+            parts.append(group_path)
         else:
             title_count += 1
-            svg += f'<g><title id="title{title_count}">.id({group_name}_name)</title>'
-            svg += _write_svg_bezier_path(bezier_data[group_name])
-            svg += f'</g>'
+            parts.append(f'<g><title id="title{title_count}">.id({group_name}_name)</title>')
+            parts.append(group_path)
+            parts.append('</g>')
 
     # for i in range(len(bezier_path)):
     #     b = bezier_path[i]
-    #     svg += f'<circle cx="{b[0][0]}" cy="{b[0][1]}" r="2" fill="green"/>\n'
-    #     svg += f'<circle cx="{b[1][0]}" cy="{b[1][1]}" r="1" fill="yellow"/>\n'
-    #     svg += f'<circle cx="{b[2][0]}" cy="{b[2][1]}" r="1" fill="purple"/>\n'
-    #     svg += f'<circle cx="{b[3][0]}" cy="{b[3][1]}" r="2" fill="brown"/>\n'
-    #     svg += f'<path d="M {b[0][0]} {b[0][1]} L {b[1][0]} {b[1][1]}" stroke="pink"/>\n'
-    #     svg += f'<path d="M {b[3][0]} {b[3][1]} L {b[2][0]} {b[2][1]}" stroke="orange"/>\n'
+    #     parts.append(f'<circle cx="{b[0][0]}" cy="{b[0][1]}" r="2" fill="green"/>\n')
+    #     parts.append(f'<circle cx="{b[1][0]}" cy="{b[1][1]}" r="1" fill="yellow"/>\n')
+    #     parts.append(f'<circle cx="{b[2][0]}" cy="{b[2][1]}" r="1" fill="purple"/>\n')
+    #     parts.append(f'<circle cx="{b[3][0]}" cy="{b[3][1]}" r="2" fill="brown"/>\n')
+    #     parts.append(f'<path d="M {b[0][0]} {b[0][1]} L {b[1][0]} {b[1][1]}" stroke="pink"/>\n')
+    #     parts.append(f'<path d="M {b[3][0]} {b[3][1]} L {b[2][0]} {b[2][1]}" stroke="orange"/>\n')
 
     for marker in markers:
         title_count += 1
-        svg += f'<circle cx="{marker[1][0]}" cy="{marker[1][1]}" r="3" fill-opacity="0.0">'
-        svg += f'<title id="title{title_count}">.id({marker[0]})</title>'
-        svg += '</circle>'
-
-    svg += '</svg>'
-
+        parts.append(_MARKER_FMT.format(marker[1][0], marker[1][1], title_count, marker[0]))
 
+    parts.append('</svg>')
 
-    return svg
+    return ''.join(parts)
@@ -3,9 +3,10 @@ Export an Argon document to WebGL documents suitable for scaffoldvuer.
 """
 import math
 import json
+import re
 
 from cmlibs.argon.argondocument import ArgonDocument
-from cmlibs.exporter.base import BaseExporter
+from cmlibs.exporter.base import BaseExporter, write_json
 from cmlibs.exporter.errors import ExportWebGLError
 
 from cmlibs.zinc.status import OK as ZINC_OK
@@ -55,8 +56,7 @@ class ArgonSceneExporter(BaseExporter):
                             'upVector': scene_description['UpVector'], 'viewAngle': scene_description['ViewAngle']}
 
                 view_file = self._form_full_filename(self._view_filename(name))
-                with open(view_file, 'w') as f:
-                    json.dump(viewData, f)
+                write_json(view_file, viewData)
 
     def _view_filename(self, name):
         return f"{self._prefix}_{name}_view.json"
@@ -148,36 +148,44 @@ class ArgonSceneExporter(BaseExporter):
             buffer = buffer.decode()
 
             if i == 0:
-                for j in range(number - 1):
-                    """
-                    IMPORTANT: the replace name here is relative to your html page, so adjust it
-                    accordingly.
-                    """
-                    replaceName = f'"{_resource_filename(self._prefix, j + 1)}"'
-                    old_name = '"memory_resource_' + str(j + 2) + '"'
-                    buffer = buffer.replace(old_name, replaceName, 1)
+                """
+                IMPORTANT: the replace names here are relative to your html page, so adjust them
+                accordingly.
+                """
+                replace_names = {f'"memory_resource_{j + 2}"': f'"{_resource_filename(self._prefix, j + 1)}"' for j in range(number - 1)}
+                if replace_names:
+                    pattern = re.compile('|'.join(re.escape(name) for name in replace_names))
+                    buffer = pattern.sub(lambda m: replace_names[m.group(0)], buffer)
 
                 view_obj = self._define_default_view_obj() if self._document else None
 
                 settings_obj = self._define_settings_obj()
 
-                obj = json.loads(buffer)
-                if obj is None:
-                    raise ExportWebGLError('There is nothing to export')
-
-                obj.append(view_obj)
+                additions = [view_obj]
                 if settings_obj is not None:
-                    obj.append(settings_obj)
+                    additions.append(settings_obj)
 
-                buffer = json.dumps(obj)
+                # Splice the additional entries in before the closing bracket of the
+                # metadata array instead of round-tripping the whole buffer through
+                # json.loads/json.dumps.
+                idx = buffer.rfind(']')
+                if idx == -1:
+                    raise ExportWebGLError('There is nothing to export')
 
-            if i == 0:
-                current_file = self.metadata_file()
+                head = buffer[:idx].rstrip()
+                with open(self.metadata_file(), 'w') as f:
+                    f.write(head)
+                    empty = head.endswith('[')
+                    for addition in additions:
+                        if not empty:
+                            f.write(', ')
+                        empty = False
+                        json.dump(addition, f)
+                    f.write(buffer[idx:])
             else:
                 current_file = self._form_full_filename(_resource_filename(self._prefix, resource_count))
-
-            with open(current_file, 'w') as f:
-                f.write(buffer)
+                with open(current_file, 'w') as f:
+                    f.write(buffer)
 
             resource_count += 1
 
@@ -5,6 +5,7 @@ from cmlibs.exporter import thumbnail
 from cmlibs.exporter import vtk
 from cmlibs.exporter import stl
 from cmlibs.exporter import wavefront
+from cmlibs.exporter.errors import ExportImageError
 
 
 here = os.path.abspath(os.path.dirname(__file__))
@@ -28,6 +29,33 @@ class Exporter(unittest.TestCase):
 
         os.remove(thumbnail_file)
 
+    def test_document_reload_after_thumbnail(self):
+        argon_document = _resource_path("argon-document.json")
+        output_target = _resource_path("")
+
+        first = thumbnail.ArgonSceneExporter(output_target=output_target)
+        first.load(argon_document)
+        try:
+            first.export()
+        except ExportImageError:
+            pass
+
+        second = vtk.ArgonSceneExporter(output_target=output_target)
+        self.assertTrue(second.load(argon_document))
+        self.assertIsNot(first._document, second._document)
+        second.export_vtk()
+
+        cube_file = _resource_path("ArgonSceneExporterVTK_cube.vtk")
+        self.assertTrue(os.path.isfile(cube_file))
+        sphere_file = _resource_path("ArgonSceneExporterVTK_sphere.vtk")
+        self.assertTrue(os.path.isfile(sphere_file))
+
+        os.remove(cube_file)
+        os.remove(sphere_file)
+        thumbnail_file = _resource_path("ArgonSceneExporterThumbnail_Layout1_thumbnail.jpeg")
+        if os.path.isfile(thumbnail_file):
+            os.remove(thumbnail_file)
+
     def test_vtk(self):
         argon_document = _resource_path("argon-document.json")
         output_target = _resource_path("")